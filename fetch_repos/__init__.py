@@ -1,3 +1,3 @@
-all = ["config","db","github_client","aggregator",]
+all = ["config","db","github_client","aggregator","loader",]
 
 version = "0.1.0"
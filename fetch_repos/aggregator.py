@@ -1,95 +1,101 @@
-from __future__ import annotations
-from typing import Any
-from .db import Database
-
-
 """ This computes and stores summary metrics from the repositories table and into
     an aggregate stored in the aggregates table.
 """
+from __future__ import annotations
+from .db import Database
 
 
-def compute_aggregates(db: Database) -> None:
-    
-    cur = db.conn.cursor()
-
-    # total_repos
-    cur.execute(f"SELECT COUNT(*) FROM {db.repositories_table};")
-    total_repos = cur.fetchone()[0]
-    db.upsert_aggregate("total_repos", None, float(total_repos))
-
-    # total_stars
-    cur.execute(f"SELECT COALESCE(SUM(stargazers_count),0) FROM {db.repositories_table};")
-    total_stars = cur.fetchone()[0] or 0
-    db.upsert_aggregate("total_stars", None, float(total_stars))
-
-    # stars_by_language
-    cur.execute(
-        f"""
-        SELECT language, COALESCE(SUM(stargazers_count),0) AS stars
-        FROM {db.repositories_table}
-        WHERE language IS NOT NULL
-        GROUP BY language
-        ORDER BY stars DESC;
-        """
-    )
-    for lang, stars in cur.fetchall():
-        db.upsert_aggregate("stars_by_language", lang, float(stars))
-
-    # forks_by_language
-    cur.execute(
-        f"""
-        SELECT language, COALESCE(SUM(forks_count),0) AS forks
-        FROM {db.repositories_table}
-        WHERE language IS NOT NULL
-        GROUP BY language
-        ORDER BY forks DESC;
-        """
-    )
-    for lang, forks in cur.fetchall():
-        db.upsert_aggregate("forks_by_language", lang, float(forks))
+def compute_aggregates(db: Database, include_dora: bool = False) -> None:
+    # Plain scans run on a pooled read-only connection; writes (and the INSERT ... SELECT
+    # statements) stay on db.conn in one transaction so the WAL is committed once
+    with db.reader() as reader, db.transaction():
+        cur = reader.cursor()
 
-    # top_repos_by_stars (top 10)
-    cur.execute(
-        f"""
-        SELECT full_name, stargazers_count
-        FROM {db.repositories_table}
-        ORDER BY stargazers_count DESC, full_name ASC
-        LIMIT 10;
-        """
-    )
-    top = [{"full_name": r[0], "stars": int(r[1])} for r in cur.fetchall()]
-    db.upsert_aggregate("top_repos_by_stars", None, float(len(top)), extra = top)
+        # total_repos / total_stars in a single scan
+        cur.execute(f"SELECT COUNT(*), COALESCE(SUM(stargazers_count),0) FROM {db.repositories_table};")
+        total_repos, total_stars = cur.fetchone()
+        db._upsert_aggregates_no_tx(
+            [
+                ("total_repos", None, float(total_repos), None),
+                ("total_stars", None, float(total_stars), None),
+            ]
+        )
 
-    # Optional DORA aggregates if DORA tables exist
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = {r[0] for r in cur.fetchall()}
-    if db.commit_activity_table in tables:
-        # Sum commits per week across all repos in this namespace (limit to last 26 weeks for brevity)
-        cur.execute(
+        # stars_by_language / forks_by_language: refresh the materialized per-language
+        # table (one GROUP BY scan), drop rows for languages it no longer has, then copy
+        # its O(#languages) rows into aggregates
+        db._refresh_mv_lang_stats_no_tx()
+        db.conn.execute(
+            f"""
+            DELETE FROM {db.aggregates_table}
+            WHERE metric IN ('stars_by_language', 'forks_by_language')
+              AND NOT EXISTS (SELECT 1 FROM {db.lang_stats_table} s WHERE s.language = key);
+            """
+        )
+        db.conn.execute(
             f"""
-            SELECT week_start, SUM(total) as commits
-            FROM {db.commit_activity_table}
-            GROUP BY week_start
-            ORDER BY week_start DESC
-            LIMIT 26;
+            INSERT INTO {db.aggregates_table}(metric, key, value, computed_at, extra_json)
+            SELECT 'stars_by_language', language, stars, strftime('%Y-%m-%dT%H:%M:%fZ','now'), NULL
+            FROM {db.lang_stats_table} WHERE true
+            UNION ALL
+            SELECT 'forks_by_language', language, forks, strftime('%Y-%m-%dT%H:%M:%fZ','now'), NULL
+            FROM {db.lang_stats_table} WHERE true
+            ON CONFLICT(metric, key) DO UPDATE SET
+                value=excluded.value,
+                computed_at=excluded.computed_at,
+                extra_json=excluded.extra_json
+            ;
             """
         )
-        rows = cur.fetchall()
-        series = [
-            {"week_start": r[0], "commits": int(r[1])}
-            for r in rows
-        ][::-1]  # oldest first
-        db.upsert_aggregate("dora_commits_by_week", None, float(len(series)), extra=series)
 
-    if db.pull_requests_table in tables:
-        # PR counts by state (total)
+        # top_repos_by_stars (top 10), serialized in rank order by SQLite
         cur.execute(
             f"""
-            SELECT state, COUNT(*)
-            FROM {db.pull_requests_table}
-            GROUP BY state;
+            SELECT COUNT(*), json_group_array(json_object('full_name', full_name, 'stars', stargazers_count))
+            FROM (
+                SELECT full_name, stargazers_count
+                FROM {db.repositories_table}
+                ORDER BY stargazers_count DESC, full_name ASC
+                LIMIT 10
+            );
             """
         )
-        totals = {r[0] or "unknown": int(r[1]) for r in cur.fetchall()}
-        total_all = sum(totals.values())
-        db.upsert_aggregate("dora_prs_total", None, float(total_all), extra=totals)
+        count, top_json = cur.fetchone()
+        db._upsert_aggregate_raw_extra("top_repos_by_stars", None, float(count), top_json)
+
+        # Optional DORA aggregates, only when DORA data was requested and its tables exist
+        if include_dora and db.has_table(db.commit_activity_table):
+            # Sum commits per week across all repos in this namespace (limit to last 26 weeks for brevity),
+            # serialized oldest first by SQLite
+            cur.execute(
+                f"""
+                SELECT COUNT(*), json_group_array(json_object('week_start', week_start, 'commits', commits))
+                FROM (
+                    SELECT week_start, commits FROM (
+                        SELECT week_start, SUM(total) AS commits
+                        FROM {db.commit_activity_table}
+                        GROUP BY week_start
+                        ORDER BY week_start DESC
+                        LIMIT 26
+                    )
+                    ORDER BY week_start ASC
+                );
+                """
+            )
+            weeks, series_json = cur.fetchone()
+            db._upsert_aggregate_raw_extra("dora_commits_by_week", None, float(weeks), series_json)
+
+        if include_dora and db.has_table(db.pull_requests_table):
+            # PR counts by state (total)
+            cur.execute(
+                f"""
+                SELECT COALESCE(SUM(cnt),0), json_group_object(state, cnt)
+                FROM (
+                    SELECT COALESCE(state, 'unknown') AS state, COUNT(*) AS cnt
+                    FROM {db.pull_requests_table}
+                    GROUP BY 1
+                );
+                """
+            )
+            total_all, totals_json = cur.fetchone()
+            db._upsert_aggregate_raw_extra("dora_prs_total", None, float(total_all), totals_json)
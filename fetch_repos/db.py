@@ -1,18 +1,20 @@
 from __future__ import annotations
 
+import re
 import sqlite3
 from contextlib import contextmanager
-from typing import Iterable, List, Dict, Any
+from pathlib import Path
+from typing import Iterable, List, Dict, Any, Tuple
 import json
-from datetime import datetime, timezone
+
+_NS_RE = re.compile(r"[^0-9A-Za-z_]+")
 
 
 def _sanitize_namespace(ns: str | None) -> str | None:
     if not ns:
         return None
     # allow only alphanumerics and underscore, lower-cased, max 40 chars
-    import re
-    cleaned = re.sub(r"[^0-9A-Za-z_]+", "_", ns).strip("_").lower()
+    cleaned = _NS_RE.sub("_", ns).strip("_").lower()
     return cleaned[:40] if cleaned else None
 
 
@@ -20,8 +22,15 @@ class Database:
     def __init__(self, path: str, namespace: str | None = None) -> None:
         self.path = path
         self.namespace = _sanitize_namespace(namespace)
-        self.conn = sqlite3.connect(self.path)
+        self.conn = sqlite3.connect(self.path, cached_statements=256)
         self.conn.row_factory = sqlite3.Row
+        # Table names present in the database, refreshed by init_schema
+        self._table_set: set[str] = set()
+        # Lazily opened read-only connections, see reader()
+        self._readers: List[sqlite3.Connection] = []
+        # Nesting depth of transaction(); only the outermost block commits
+        self._tx_depth = 0
+        self._prepare_statements()
         self._configure()
         # Ensure schema exists so ad-hoc usage (e.g., one-liners) works without manual calls
         self.init_schema()
@@ -42,6 +51,10 @@ class Database:
     def aggregates_table(self) -> str:
         return f"aggregates_{self.namespace}" if self.namespace else "aggregates"
 
+    @property
+    def lang_stats_table(self) -> str:
+        return f"mv_lang_stats_{self.namespace}" if self.namespace else "mv_lang_stats"
+
     @property
     def commit_activity_table(self) -> str:
         return f"commit_activity_{self.namespace}" if self.namespace else "commit_activity"
@@ -50,24 +63,154 @@ class Database:
     def pull_requests_table(self) -> str:
         return f"pull_requests_{self.namespace}" if self.namespace else "pull_requests"
 
+    @property
+    def extras_cache_table(self) -> str:
+        return f"extras_cache_{self.namespace}" if self.namespace else "extras_cache"
+
+    def _prepare_statements(self) -> None:
+        # Table names are fixed once the namespace is known, so build the hot-path SQL once;
+        # identical text on every call keeps hitting sqlite3's prepared-statement cache
+        self._sql_upsert_repositories = f"""
+            INSERT INTO {self.repositories_table} (
+                repo_id,name,full_name,owner_login,private,fork,html_url,description,
+                created_at,updated_at,pushed_at,stargazers_count,watchers_count,forks_count,
+                open_issues_count,language,size,license,archived,disabled
+            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            ON CONFLICT(repo_id) DO UPDATE SET
+                name=excluded.name,
+                full_name=excluded.full_name,
+                owner_login=excluded.owner_login,
+                private=excluded.private,
+                fork=excluded.fork,
+                html_url=excluded.html_url,
+                description=excluded.description,
+                created_at=excluded.created_at,
+                updated_at=excluded.updated_at,
+                pushed_at=excluded.pushed_at,
+                stargazers_count=excluded.stargazers_count,
+                watchers_count=excluded.watchers_count,
+                forks_count=excluded.forks_count,
+                open_issues_count=excluded.open_issues_count,
+                language=excluded.language,
+                size=excluded.size,
+                license=excluded.license,
+                archived=excluded.archived,
+                disabled=excluded.disabled
+            ;
+            """
+        self._sql_upsert_languages = f"""
+            INSERT INTO {self.languages_table}(repo_id, language, bytes) VALUES (?,?,?)
+            ON CONFLICT(repo_id, language) DO UPDATE SET bytes=excluded.bytes;
+            """
+        self._sql_upsert_contributors = f"""
+            INSERT INTO {self.contributors_table}(repo_id, login, contributions) VALUES (?,?,?)
+            ON CONFLICT(repo_id, login) DO UPDATE SET contributions=excluded.contributions;
+            """
+        self._sql_delete_scalar_aggregate = f"DELETE FROM {self.aggregates_table} WHERE metric=? AND key IS NULL;"
+        self._sql_upsert_aggregate = f"""
+            INSERT INTO {self.aggregates_table}(metric, key, value, computed_at, extra_json)
+            VALUES (?,?,?,strftime('%Y-%m-%dT%H:%M:%fZ','now'),?)
+            ON CONFLICT(metric, key) DO UPDATE SET
+                value=excluded.value,
+                computed_at=excluded.computed_at,
+                extra_json=excluded.extra_json
+            ;
+            """
+        self._sql_add_scalar_aggregate = f"""
+            UPDATE {self.aggregates_table} SET value=value+?, computed_at=strftime('%Y-%m-%dT%H:%M:%fZ','now')
+            WHERE metric=? AND key IS NULL;
+            """
+        self._sql_add_aggregate = f"""
+            INSERT INTO {self.aggregates_table}(metric, key, value, computed_at, extra_json)
+            VALUES (?,?,?,strftime('%Y-%m-%dT%H:%M:%fZ','now'),NULL)
+            ON CONFLICT(metric, key) DO UPDATE SET
+                value=value+excluded.value,
+                computed_at=excluded.computed_at
+            ;
+            """
+        self._sql_get_cached_extra = f"""
+            SELECT payload FROM {self.extras_cache_table}
+            WHERE repo_id=? AND endpoint=? AND pushed_at=?;
+            """
+        self._sql_put_cached_extra = f"""
+            INSERT OR REPLACE INTO {self.extras_cache_table}(repo_id, endpoint, pushed_at, payload)
+            VALUES (?,?,?,?);
+            """
+        self._sql_upsert_commit_activity = f"""
+            INSERT INTO {self.commit_activity_table}(repo_id, week_start, total) VALUES (?,?,?)
+            ON CONFLICT(repo_id, week_start) DO UPDATE SET total=excluded.total;
+            """
+        self._sql_upsert_pull_requests = f"""
+            INSERT INTO {self.pull_requests_table}(repo_id, number, state, created_at, merged_at, closed_at)
+            VALUES (?,?,?,?,?,?)
+            ON CONFLICT(repo_id, number) DO UPDATE SET
+                state=excluded.state,
+                created_at=excluded.created_at,
+                merged_at=excluded.merged_at,
+                closed_at=excluded.closed_at;
+            """
+
     def _configure(self) -> None:
         cur = self.conn.cursor()
         cur.execute("PRAGMA journal_mode=WAL;")
         cur.execute("PRAGMA synchronous=NORMAL;")
         cur.execute("PRAGMA foreign_keys=ON;")
+        # Read-side tuning for the aggregate scans: mmap I/O, ~20MB page cache,
+        # in-memory temp b-trees for sorts; wait on locks instead of SQLITE_BUSY
+        cur.execute("PRAGMA mmap_size=268435456;")
+        cur.execute("PRAGMA cache_size=-20000;")
+        cur.execute("PRAGMA temp_store=MEMORY;")
+        cur.execute("PRAGMA busy_timeout=5000;")
         self.conn.commit()
 
     def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
+        self._readers.clear()
+        # Let SQLite refresh planner statistics gathered during this session (cheap no-op if none needed)
+        self.conn.execute("PRAGMA optimize;")
         self.conn.close()
 
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection so scans can run alongside the writer under WAL."""
+        if self.path in ("", ":memory:") or self._tx_depth > 0 or self.conn.in_transaction:
+            # private databases are invisible to other connections, and a separate reader
+            # would not see the writer's uncommitted rows
+            yield self.conn
+            return
+        conn = self._readers.pop() if self._readers else self._open_reader()
+        try:
+            yield conn
+        finally:
+            self._readers.append(conn)
+
+    def _open_reader(self) -> sqlite3.Connection:
+        uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        cur = conn.cursor()
+        cur.execute("PRAGMA mmap_size=268435456;")
+        cur.execute("PRAGMA cache_size=-20000;")
+        cur.execute("PRAGMA temp_store=MEMORY;")
+        cur.execute("PRAGMA busy_timeout=5000;")
+        return conn
+
     @contextmanager
     def transaction(self):
+        # Reentrant: the upsert_* methods each open one, so callers can group a whole
+        # run's writes into a single commit by wrapping them in an outer block
+        self._tx_depth += 1
         try:
             yield
-            self.conn.commit()
+            if self._tx_depth == 1:
+                self.conn.commit()
         except Exception:
-            self.conn.rollback()
+            if self._tx_depth == 1:
+                self.conn.rollback()
             raise
+        finally:
+            self._tx_depth -= 1
 
     def init_schema(self) -> None:
         cur = self.conn.cursor()
@@ -97,7 +240,14 @@ class Database:
             );
 
             CREATE INDEX IF NOT EXISTS idx_{self.repositories_table}_language ON {self.repositories_table}(language);
-            CREATE INDEX IF NOT EXISTS idx_{self.repositories_table}_stars ON {self.repositories_table}(stargazers_count DESC);
+            -- covers top_repos_by_stars and the top-repos export (ORDER BY stars DESC, full_name ASC,
+            -- projecting forks/language) without a sort or table lookup; supersedes the older
+            -- stars-only and stars+name indexes, which are prefixes of it
+            DROP INDEX IF EXISTS idx_{self.repositories_table}_stars;
+            DROP INDEX IF EXISTS idx_{self.repositories_table}_stars_name;
+            CREATE INDEX IF NOT EXISTS idx_{self.repositories_table}_top ON {self.repositories_table}(stargazers_count DESC, full_name ASC, forks_count, language);
+            -- covers the per-language GROUP BY scans (ordered, index-only; NULL languages excluded)
+            CREATE INDEX IF NOT EXISTS idx_{self.repositories_table}_lang_cov ON {self.repositories_table}(language, stargazers_count, forks_count) WHERE language IS NOT NULL;
 
             CREATE TABLE IF NOT EXISTS {self.languages_table} (
                 repo_id INTEGER,
@@ -124,6 +274,13 @@ class Database:
                 PRIMARY KEY (metric, key)
             );
 
+            -- per-language stars/forks, materialized from repositories by refresh_mv_lang_stats()
+            CREATE TABLE IF NOT EXISTS {self.lang_stats_table} (
+                language TEXT PRIMARY KEY,
+                stars INTEGER,
+                forks INTEGER
+            );
+
             -- DORA tables
             CREATE TABLE IF NOT EXISTS {self.commit_activity_table} (
                 repo_id INTEGER,
@@ -143,151 +300,216 @@ class Database:
                 PRIMARY KEY (repo_id, number),
                 FOREIGN KEY (repo_id) REFERENCES {self.repositories_table}(repo_id) ON DELETE CASCADE
             );
+
+            -- last API payload per (repo, endpoint), valid while the repo's pushed_at is unchanged;
+            -- one row per pair, so a newer pushed_at replaces the stale entry
+            CREATE TABLE IF NOT EXISTS {self.extras_cache_table} (
+                repo_id INTEGER,
+                endpoint TEXT,
+                pushed_at TEXT,
+                payload TEXT,
+                PRIMARY KEY (repo_id, endpoint)
+            );
             """
         )
         self.conn.commit()
+        self._table_set = {r[0] for r in self.conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+    def has_table(self, name: str) -> bool:
+        return name in self._table_set
+
+    def refresh_mv_lang_stats(self) -> None:
+        with self.transaction():
+            self._refresh_mv_lang_stats_no_tx()
+
+    def _refresh_mv_lang_stats_no_tx(self) -> None:
+        # Full rebuild in one GROUP BY scan; languages no longer present drop out
+        self.conn.execute(f"DELETE FROM {self.lang_stats_table};")
+        self.conn.execute(
+            f"""
+            INSERT INTO {self.lang_stats_table}(language, stars, forks)
+            SELECT language, COALESCE(SUM(stargazers_count),0), COALESCE(SUM(forks_count),0)
+            FROM {self.repositories_table}
+            WHERE language IS NOT NULL
+            GROUP BY language;
+            """
+        )
 
     def upsert_repositories(self, repos: Iterable[Dict[str, Any]]) -> None:
-        rows = []
+        rows: List[Tuple[Any, ...]] = []
+        rows_append = rows.append
         for r in repos:
-            rows.append(
+            get = r.get
+            owner = get("owner")
+            lic = get("license")
+            rows_append(
                 (
-                    r.get("id"),
-                    r.get("name"),
-                    r.get("full_name"),
-                    r.get("owner", {}).get("login"),
-                    1 if r.get("private") else 0,
-                    1 if r.get("fork") else 0,
-                    r.get("html_url"),
-                    r.get("description"),
-                    r.get("created_at"),
-                    r.get("updated_at"),
-                    r.get("pushed_at"),
-                    r.get("stargazers_count"),
-                    r.get("watchers_count"),
-                    r.get("forks_count"),
-                    r.get("open_issues_count"),
-                    r.get("language"),
-                    r.get("size"),
-                    (r.get("license") or {}).get("name") if r.get("license") else None,
-                    1 if r.get("archived") else 0,
-                    1 if r.get("disabled") else 0,
+                    get("id"),
+                    get("name"),
+                    get("full_name"),
+                    owner.get("login") if owner else None,
+                    1 if get("private") else 0,
+                    1 if get("fork") else 0,
+                    get("html_url"),
+                    get("description"),
+                    get("created_at"),
+                    get("updated_at"),
+                    get("pushed_at"),
+                    get("stargazers_count"),
+                    get("watchers_count"),
+                    get("forks_count"),
+                    get("open_issues_count"),
+                    get("language"),
+                    get("size"),
+                    lic.get("name") if lic else None,
+                    1 if get("archived") else 0,
+                    1 if get("disabled") else 0,
                 )
             )
         with self.transaction():
-            self.conn.executemany(
+            deltas = self._repository_aggregate_deltas(rows)
+            self.conn.executemany(self._sql_upsert_repositories, rows)
+            if deltas:
+                self._apply_aggregate_deltas(deltas)
+
+    def _repository_aggregate_deltas(self, rows: List[Tuple[Any, ...]]) -> List[Tuple[str, str | None, float]]:
+        # Only maintain aggregates incrementally once compute_aggregates has seeded them;
+        # until then an empty aggregates table is not a valid baseline to add deltas to
+        seeded = self.conn.execute(
+            f"SELECT 1 FROM {self.aggregates_table} WHERE metric='total_repos' AND key IS NULL LIMIT 1;"
+        ).fetchone()
+        if not seeded or not rows:
+            return []
+
+        ids = [row[0] for row in rows if row[0] is not None]
+        state: Dict[Any, Tuple[str | None, int, int]] = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            cur = self.conn.execute(
                 f"""
-                INSERT INTO {self.repositories_table} (
-                    repo_id,name,full_name,owner_login,private,fork,html_url,description,
-                    created_at,updated_at,pushed_at,stargazers_count,watchers_count,forks_count,
-                    open_issues_count,language,size,license,archived,disabled
-                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                ON CONFLICT(repo_id) DO UPDATE SET
-                    name=excluded.name,
-                    full_name=excluded.full_name,
-                    owner_login=excluded.owner_login,
-                    private=excluded.private,
-                    fork=excluded.fork,
-                    html_url=excluded.html_url,
-                    description=excluded.description,
-                    created_at=excluded.created_at,
-                    updated_at=excluded.updated_at,
-                    pushed_at=excluded.pushed_at,
-                    stargazers_count=excluded.stargazers_count,
-                    watchers_count=excluded.watchers_count,
-                    forks_count=excluded.forks_count,
-                    open_issues_count=excluded.open_issues_count,
-                    language=excluded.language,
-                    size=excluded.size,
-                    license=excluded.license,
-                    archived=excluded.archived,
-                    disabled=excluded.disabled
-                ;
+                SELECT repo_id, language, COALESCE(stargazers_count,0), COALESCE(forks_count,0)
+                FROM {self.repositories_table}
+                WHERE repo_id IN ({",".join("?" * len(chunk))});
                 """,
-                rows,
+                chunk,
             )
+            for repo_id, lang, stars, forks in cur:
+                state[repo_id] = (lang, stars, forks)
+
+        total_repos = 0
+        total_stars = 0
+        stars_by_lang: Dict[str, int] = {}
+        forks_by_lang: Dict[str, int] = {}
+        for row in rows:
+            repo_id, lang = row[0], row[15]
+            stars, forks = row[11] or 0, row[13] or 0
+            old = state.get(repo_id) if repo_id is not None else None
+            if old is None:
+                total_repos += 1
+            else:
+                old_lang, old_stars, old_forks = old
+                total_stars -= old_stars
+                if old_lang is not None:
+                    stars_by_lang[old_lang] = stars_by_lang.get(old_lang, 0) - old_stars
+                    forks_by_lang[old_lang] = forks_by_lang.get(old_lang, 0) - old_forks
+            total_stars += stars
+            if lang is not None:
+                stars_by_lang[lang] = stars_by_lang.get(lang, 0) + stars
+                forks_by_lang[lang] = forks_by_lang.get(lang, 0) + forks
+            if repo_id is not None:
+                state[repo_id] = (lang, stars, forks)
+
+        deltas: List[Tuple[str, str | None, float]] = [
+            ("total_repos", None, float(total_repos)),
+            ("total_stars", None, float(total_stars)),
+        ]
+        deltas.extend(("stars_by_language", lang, float(v)) for lang, v in stars_by_lang.items())
+        deltas.extend(("forks_by_language", lang, float(v)) for lang, v in forks_by_lang.items())
+        return [d for d in deltas if d[2]]
+
+    def _apply_aggregate_deltas(self, deltas: Iterable[Tuple[str, str | None, float]]) -> None:
+        # Adds (metric, key, delta) to the stored aggregate; the caller owns the transaction
+        keyed = []
+        for metric, key, delta in deltas:
+            if key is None:
+                # NULL keys never conflict on the primary key, so update in place
+                cur = self.conn.execute(self._sql_add_scalar_aggregate, (delta, metric))
+                if cur.rowcount == 0:
+                    keyed.append((metric, key, delta))
+            else:
+                keyed.append((metric, key, delta))
+        self.conn.executemany(self._sql_add_aggregate, keyed)
 
     def upsert_languages(self, items: Iterable[Dict[str, Any]]) -> None:
-        rows = []
-        for it in items:
-            repo_id = it["repo_id"]
-            for lang, b in it["languages"].items():
-                rows.append((repo_id, lang, int(b)))
+        # Generators let sqlite3 pull rows lazily instead of materializing a full list
+        self.upsert_language_rows(
+            (it["repo_id"], lang, int(b))
+            for it in items
+            for lang, b in it["languages"].items()
+        )
+
+    def upsert_language_rows(self, rows: Iterable[Tuple[int, str, int]]) -> None:
+        # rows are (repo_id, language, bytes), already in column order
         with self.transaction():
-            self.conn.executemany(
-                f"""
-                INSERT INTO {self.languages_table}(repo_id, language, bytes) VALUES (?,?,?)
-                ON CONFLICT(repo_id, language) DO UPDATE SET bytes=excluded.bytes;
-                """,
-                rows,
-            )
+            self.conn.executemany(self._sql_upsert_languages, rows)
 
-    def upsert_contributors(self, items: Iterable[Dict[str, Any]]) -> None:
-        rows = []
-        for it in items:
-            repo_id = it["repo_id"]
-            for c in it["contributors"]:
-                rows.append((repo_id, c.get("login"), int(c.get("contributions", 0))))
+    def upsert_contributors(self, rows: Iterable[Tuple[int, str, int]]) -> None:
+        # rows are (repo_id, login, contributions), already in column order
         with self.transaction():
-            self.conn.executemany(
-                f"""
-                INSERT INTO {self.contributors_table}(repo_id, login, contributions) VALUES (?,?,?)
-                ON CONFLICT(repo_id, login) DO UPDATE SET contributions=excluded.contributions;
-                """,
-                rows,
-            )
+            self.conn.executemany(self._sql_upsert_contributors, rows)
 
     def upsert_aggregate(self, metric: str, key: str | None, value: float, extra: Any | None = None) -> None:
-        now = datetime.now(timezone.utc).isoformat()
-        extra_json = json.dumps(extra) if extra is not None else None
+        self.bulk_upsert_aggregates([(metric, key, value, extra)])
+
+    def bulk_upsert_aggregates(self, rows: Iterable[Tuple[str, str | None, float, Any | None]]) -> None:
+        """Upsert many (metric, key, value, extra) rows with one executemany and one commit."""
         with self.transaction():
-            self.conn.execute(
-                f"""
-                INSERT INTO {self.aggregates_table}(metric, key, value, computed_at, extra_json)
-                VALUES (?,?,?,?,?)
-                ON CONFLICT(metric, key) DO UPDATE SET
-                    value=excluded.value,
-                    computed_at=excluded.computed_at,
-                    extra_json=excluded.extra_json
-                ;
-                """,
-                (metric, key, float(value), now, extra_json),
-            )
+            self._upsert_aggregates_no_tx(rows)
+
+    def _upsert_aggregates_no_tx(self, rows: Iterable[Tuple[str, str | None, float, Any | None]]) -> None:
+        # (metric, key, value, extra) rows in one executemany; the caller owns the transaction
+        self._write_aggregate_rows(
+            [
+                (metric, key, value, json.dumps(extra) if extra is not None else None)
+                for metric, key, value, extra in rows
+            ]
+        )
+
+    def _upsert_aggregate_raw_extra(self, metric: str, key: str | None, value: float, extra_json: str | None) -> None:
+        # extra_json is stored as-is (e.g. built by SQLite's JSON functions); the caller owns the transaction
+        self._write_aggregate_rows([(metric, key, value, extra_json)])
+
+    def _write_aggregate_rows(self, rows: List[Tuple[str, str | None, float, str | None]]) -> None:
+        # computed_at is filled in by SQLite, so no per-row Python timestamp
+        payload = [(metric, key, float(value), extra_json) for metric, key, value, extra_json in rows]
+        # NULL keys are distinct under the (metric, key) primary key and would never hit
+        # ON CONFLICT; replace those rows explicitly so each scalar metric has a single row
+        scalar_metrics = [(p[0],) for p in payload if p[1] is None]
+        if scalar_metrics:
+            self.conn.executemany(self._sql_delete_scalar_aggregate, scalar_metrics)
+        self.conn.executemany(self._sql_upsert_aggregate, payload)
 
     def upsert_commit_activity(self, items: Iterable[Dict[str, Any]]) -> None:
-        rows = []
-        for it in items:
-            rows.append((it["repo_id"], it["week_start"], int(it["total"])) )
-        if not rows:
-            return
+        rows = ((it["repo_id"], it["week_start"], int(it["total"])) for it in items)
         with self.transaction():
-            self.conn.executemany(
-                f"""
-                INSERT INTO {self.commit_activity_table}(repo_id, week_start, total) VALUES (?,?,?)
-                ON CONFLICT(repo_id, week_start) DO UPDATE SET total=excluded.total;
-                """,
-                rows,
-            )
+            self.conn.executemany(self._sql_upsert_commit_activity, rows)
 
-    def upsert_pull_requests(self, items: Iterable[Dict[str, Any]]) -> None:
-        rows = []
-        for it in items:
-            rows.append((
-                it["repo_id"], int(it["number"]), it.get("state"),
-                it.get("created_at"), it.get("merged_at"), it.get("closed_at")
-            ))
-        if not rows:
-            return
+    def upsert_pull_requests(self, rows: Iterable[Tuple[Any, ...]]) -> None:
+        # rows are (repo_id, number, state, created_at, merged_at, closed_at), already in column order
+        with self.transaction():
+            self.conn.executemany(self._sql_upsert_pull_requests, rows)
+
+    def get_cached_extra(self, repo_id: int, endpoint: str, pushed_at: str) -> Any | None:
+        row = self.conn.execute(self._sql_get_cached_extra, (repo_id, endpoint, pushed_at)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_cached_extra(self, repo_id: int, endpoint: str, pushed_at: str, payload: Any) -> None:
+        self.put_cached_extras([(repo_id, endpoint, pushed_at, payload)])
+
+    def put_cached_extras(self, rows: Iterable[Tuple[int, str, str, Any]]) -> None:
+        # rows are (repo_id, endpoint, pushed_at, payload); payloads are stored as JSON
         with self.transaction():
             self.conn.executemany(
-                f"""
-                INSERT INTO {self.pull_requests_table}(repo_id, number, state, created_at, merged_at, closed_at)
-                VALUES (?,?,?,?,?,?)
-                ON CONFLICT(repo_id, number) DO UPDATE SET
-                    state=excluded.state,
-                    created_at=excluded.created_at,
-                    merged_at=excluded.merged_at,
-                    closed_at=excluded.closed_at;
-                """,
-                rows,
+                self._sql_put_cached_extra,
+                ((repo_id, endpoint, pushed_at, json.dumps(payload)) for repo_id, endpoint, pushed_at, payload in rows),
             )
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List, Optional
-import aiohttp
+import os
+import re
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+import httpx
+import orjson
 import time
 
 API_ROOT = "https://api.github.com"
+PER_PAGE = 100
+# One entry of a Link header: <url>; rel="name"
+_LINK_RE = re.compile(r'<(?P<url>[^>]*)>\s*;\s*rel="(?P<rel>[^"]+)"')
+# ETag -> response body caches kept across runs, used for conditional requests; the
+# fetch keeps one file per target namespace, see ETAG_CACHE_DIR in main
+ETAG_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "repo-aggregator")
+ETAG_CACHE_PATH = os.path.join(ETAG_CACHE_DIR, "etags.json")
 
 
 class RateLimitError(Exception):
@@ -13,12 +24,32 @@ class RateLimitError(Exception):
 
 
 class GitHubClient:
-    def __init__(self, token: Optional[str] = None, concurrency: int = 10, timeout: int = 30) -> None:
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        concurrency: int = 10,
+        timeout: int = 30,
+        etag_cache_path: Optional[str] = ETAG_CACHE_PATH,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
         # Normalize token to avoid CR/LF in headers
         self.token = token.strip() if isinstance(token, str) else None
+        self.concurrency = concurrency
         self.semaphore = asyncio.Semaphore(concurrency)
-        self.timeout = aiohttp.ClientTimeout(total=timeout)
-        self._session: Optional[aiohttp.ClientSession] = None
+        self.timeout = httpx.Timeout(timeout)
+        self._session: Optional[httpx.AsyncClient] = None
+        # Custom transport for the HTTP client (e.g. httpx.MockTransport in tests)
+        self._transport = transport
+        # key -> (etag, body); None path disables the on-disk cache
+        self.etag_cache_path = etag_cache_path
+        self._etag_store: Dict[str, Tuple[str, Any]] = {}
+        # keys requested this run; only these are persisted, so stale pages don't pile up
+        self._etag_used: Set[str] = set()
+        self._etag_dirty = False
+        # Rate-limit credits left in the current window as last reported by GitHub
+        # (None until a response carries X-RateLimit-* headers)
+        self._credits: Optional[int] = None
+        self._credits_reset = 0
 
     async def __aenter__(self) -> "GitHubClient":
         headers = {
@@ -27,53 +58,212 @@ class GitHubClient:
         }
         if self.token:
             headers["Authorization"] = f"Bearer {self.token}"
-        self._session = aiohttp.ClientSession(headers=headers, timeout=self.timeout)
+        # HTTP/2 multiplexes the concurrent requests over one warm TLS connection;
+        # the pool is sized to the concurrency so nothing is re-handshaked mid-run
+        self._session = httpx.AsyncClient(
+            headers=headers,
+            timeout=self.timeout,
+            http2=True,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            transport=self._transport,
+        )
+        self._load_etags()
         return self
 
     async def __aexit__(self, exc_type, exc, tb) -> None:
         if self._session:
-            await self._session.close()
+            await self._session.aclose()
             self._session = None
+        # a run cut short by an error saw only part of the listing; keep the rest of the cache
+        self._save_etags(prune=exc_type is None)
+
+    def _load_etags(self) -> None:
+        if not self.etag_cache_path or not os.path.exists(self.etag_cache_path):
+            return
+        try:
+            with open(self.etag_cache_path, "rb") as f:
+                data = orjson.loads(f.read())
+        except (OSError, ValueError):
+            # a corrupt or unreadable cache only costs full downloads
+            return
+        if isinstance(data, dict):
+            self._etag_store = {k: (v[0], v[1]) for k, v in data.items() if isinstance(v, list) and len(v) == 2}
+
+    def _save_etags(self, prune: bool = True) -> None:
+        if not self.etag_cache_path:
+            return
+        store = self._etag_store
+        if prune:
+            store = {k: v for k, v in store.items() if k in self._etag_used}
+        if not self._etag_dirty and len(store) == len(self._etag_store):
+            return
+        os.makedirs(os.path.dirname(self.etag_cache_path), exist_ok=True)
+        tmp = f"{self.etag_cache_path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(store))
+        os.replace(tmp, self.etag_cache_path)
+        self._etag_dirty = False
+
+    async def _acquire_credit(self) -> None:
+        # Wait out an exhausted rate-limit window instead of sending requests that would 403
+        while self._credits is not None and self._credits <= 0:
+            wait = self._credits_reset - time.time()
+            if wait <= 0:
+                # window rolled over; the next response re-seeds the count
+                self._credits = None
+                break
+            await asyncio.sleep(wait + 1)
+        if self._credits is not None:
+            self._credits -= 1
+
+    def _update_credits(self, headers: Mapping[str, str]) -> None:
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if not (remaining and reset and remaining.isdigit() and reset.isdigit()):
+            return
+        remaining_i, reset_i = int(remaining), int(reset)
+        if reset_i == self._credits_reset and self._credits is not None:
+            # responses can land out of order; within one window the lowest count is the freshest
+            self._credits = min(self._credits, remaining_i)
+        else:
+            self._credits = remaining_i
+            self._credits_reset = reset_i
+
+    @staticmethod
+    def _etag_key(method: str, url: str, params: Optional[Dict[str, Any]]) -> str:
+        return f"{method} {url} {sorted((params or {}).items())}"
 
     async def _request_json(self, method: str, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        data, _ = await self._request_json_with_headers(method, url, params=params)
+        return data
+
+    async def _request_json_with_headers(
+        self, method: str, url: str, params: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Any, Mapping[str, str]]:
         assert self._session is not None
+        key = self._etag_key(method, url, params)
+        self._etag_used.add(key)
+        cached = self._etag_store.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else None
         backoff = 1.0
         while True:
+            await self._acquire_credit()
             async with self.semaphore:
-                async with self._session.request(method, url, params=params) as resp:
-                    if resp.status == 403:
-                        # Could be rate limit
-                        remaining = resp.headers.get("X-RateLimit-Remaining")
-                        reset = resp.headers.get("X-RateLimit-Reset")
-                        if remaining == "0" and reset:
-                            reset_ts = int(reset)
-                            sleep_for = max(0, reset_ts - int(time.time()) + 1)
-                            await asyncio.sleep(sleep_for)
-                            continue
-                    if resp.status in (429, 502, 503, 504):
-                        await asyncio.sleep(backoff)
-                        backoff = min(backoff * 2, 30)
+                resp = await self._session.request(method, url, params=params, headers=headers)
+                self._update_credits(resp.headers)
+                if resp.status_code == 304 and cached:
+                    # unchanged since last run; GitHub does not charge 304s against the rate limit
+                    return cached[1], resp.headers
+                if resp.status_code in (403, 429):
+                    retry_after = resp.headers.get("Retry-After")
+                    if retry_after and retry_after.isdigit():
+                        # secondary rate limit: GitHub says exactly how long to back off
+                        await asyncio.sleep(int(retry_after))
+                        continue
+                    if resp.headers.get("X-RateLimit-Remaining") == "0" and self._credits == 0:
+                        # exhausted despite the local count (e.g. the token is shared);
+                        # credits are now 0, so _acquire_credit waits for the reset.
+                        # Without a usable reset header fall through to backoff / raise
                         continue
-                    resp.raise_for_status()
-                    return await resp.json()
+                if resp.status_code in (429, 502, 503, 504):
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+                    continue
+                resp.raise_for_status()
+                # orjson parses the (often large, nested) payloads markedly faster than json
+                data = orjson.loads(resp.content)
+                etag = resp.headers.get("ETag")
+                if etag:
+                    self._etag_store[key] = (etag, data)
+                    self._etag_dirty = True
+                elif self._etag_store.pop(key, None) is not None:
+                    self._etag_dirty = True
+                return data, resp.headers
+
+    @staticmethod
+    def _page_items(data: Any) -> List[Dict[str, Any]]:
+        if isinstance(data, list):
+            return data
+        # some endpoints might return a dict; normalize
+        return data.get("items", []) if isinstance(data, dict) else []
+
+    @staticmethod
+    def _last_page(headers: Mapping[str, str]) -> Optional[int]:
+        for link in headers.get("Link", "").split(","):
+            match = _LINK_RE.match(link.strip())
+            if match and match.group("rel") == "last":
+                pages = parse_qs(urlparse(match.group("url")).query).get("page")
+                if pages and pages[0].isdigit():
+                    return int(pages[0])
+        return None
 
     async def _paginate(self, url: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        def page_params(page: int) -> Dict[str, Any]:
+            merged = dict(params or {})
+            merged.update({"per_page": PER_PAGE, "page": page})
+            return merged
+
+        # Page 1 alone: most listings (contributors of a typical repo) fit in a single page
+        data, headers = await self._request_json_with_headers("GET", url, params=page_params(1))
+        # Copy: the page-1 body may be the object held in the ETag store, which must not grow
+        items = list(self._page_items(data))
+        if len(items) < PER_PAGE:
+            return items
+
+        # GitHub advertises the final page in the Link header; when present, fetch the rest in one go
+        last = self._last_page(headers)
+        if last is not None:
+            results = await asyncio.gather(
+                *(self._request_json_with_headers("GET", url, params=page_params(p)) for p in range(2, last + 1))
+            )
+            for data, _ in results:
+                items.extend(self._page_items(data))
+            return items
+
+        # Otherwise fetch the following pages speculatively, a window at a time
+        # (self.semaphore still bounds what is in flight), until a short page ends the listing
+        page = 2
+        while True:
+            window = range(page, page + self.concurrency)
+            results = await asyncio.gather(
+                *(self._request_json_with_headers("GET", url, params=page_params(p)) for p in window)
+            )
+            for data, _ in results:
+                page_items = self._page_items(data)
+                items.extend(page_items)
+                if len(page_items) < PER_PAGE:
+                    return items
+            page += self.concurrency
+
+    async def _paginate_until(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        stop_when: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        max_items: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Serial pagination for listings sorted so that everything after the first
+        item matching stop_when is unwanted too; stops there, or at max_items,
+        without requesting any further pages.
+        """
+        page_size = min(PER_PAGE, max_items) if max_items else PER_PAGE
         items: List[Dict[str, Any]] = []
         page = 1
         while True:
             merged = dict(params or {})
-            merged.update({"per_page": 100, "page": page})
+            merged.update({"per_page": page_size, "page": page})
             data = await self._request_json("GET", url, params=merged)
-            if not isinstance(data, list):
-                # some endpoints might return a dict; normalize
-                page_items = data.get("items", []) if isinstance(data, dict) else []
-            else:
-                page_items = data
-            if not page_items:
-                break
-            items.extend(page_items)
+            page_items = self._page_items(data)
+            for item in page_items:
+                if stop_when is not None and stop_when(item):
+                    return items
+                items.append(item)
+                if max_items and len(items) >= max_items:
+                    return items
+            if len(page_items) < page_size:
+                return items
             page += 1
-        return items
 
     async def list_user_repos(self, username: str) -> List[Dict[str, Any]]:
         url = f"{API_ROOT}/users/{username}/repos"
@@ -87,7 +277,8 @@ class GitHubClient:
         url = f"{API_ROOT}/repos/{owner}/{repo}/languages"
         data = await self._request_json("GET", url)
         if isinstance(data, dict):
-            return {k: int(v) for k, v in data.items()}
+            # byte counts arrive as JSON ints; only coerce the odd non-int value
+            return {k: v if type(v) is int else int(v) for k, v in data.items()}
         return {}
 
     async def list_repo_contributors(self, owner: str, repo: str) -> List[Dict[str, Any]]:
@@ -103,19 +294,35 @@ class GitHubClient:
         url = f"{API_ROOT}/repos/{owner}/{repo}/stats/commit_activity"
         backoff = 1.0
         for _ in range(6):
+            await self._acquire_credit()
             async with self.semaphore:
-                async with self._session.get(url) as resp:
-                    if resp.status == 202:
-                        await asyncio.sleep(backoff)
-                        backoff = min(backoff * 2, 16)
-                        continue
-                    resp.raise_for_status()
-                    data = await resp.json()
-                    if isinstance(data, list):
-                        return data
-                    return []
+                resp = await self._session.get(url)
+                self._update_credits(resp.headers)
+                if resp.status_code == 202:
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 16)
+                    continue
+                resp.raise_for_status()
+                data = orjson.loads(resp.content)
+                if isinstance(data, list):
+                    return data
+                return []
         return []
 
-    async def list_repo_pull_requests(self, owner: str, repo: str, state: str = "all") -> List[Dict[str, Any]]:
+    async def list_repo_pull_requests(
+        self,
+        owner: str,
+        repo: str,
+        state: str = "all",
+        since_iso: Optional[str] = None,
+        max_items: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
         url = f"{API_ROOT}/repos/{owner}/{repo}/pulls"
-        return await self._paginate(url, params={"state": state, "sort": "created", "direction": "desc"})
+        params = {"state": state, "sort": "created", "direction": "desc"}
+        if since_iso is None and not max_items:
+            return await self._paginate(url, params=params)
+        # Newest first, so the first PR created before since_iso ends the listing
+        def stop_when(pr: Dict[str, Any]) -> bool:
+            return since_iso is not None and (pr.get("created_at") or "") < since_iso
+
+        return await self._paginate_until(url, params=params, stop_when=stop_when, max_items=max_items)
@@ -0,0 +1,60 @@
+""" DataLoader-style coalescing for per-repo API calls: loads issued within one
+    event-loop tick are dispatched together, each settling as soon as its own fetch
+    does, and repeated keys share a single fetch while it is in flight. Resolved
+    results are not retained, so memory stays bounded by what callers still hold.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+
+class Loader:
+    def __init__(self, fetch_fn: Callable[..., Awaitable[Any]]) -> None:
+        # fetch_fn is called with the key unpacked, e.g. fetch_fn(owner, name)
+        self._fetch_fn = fetch_fn
+        # in-flight loads only; entries are dropped once resolved
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Tuple[Any, ...]] = []
+        self._scheduled = False
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: Tuple[Any, ...]) -> asyncio.Future:
+        fut = self._futures.get(key)
+        if fut is not None:
+            return fut
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._futures[key] = fut
+        self._pending.append(key)
+        if not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._dispatch)
+        return fut
+
+    def _dispatch(self) -> None:
+        keys, self._pending = self._pending, []
+        self._scheduled = False
+        # One task per key, so each future settles as soon as its own fetch does;
+        # a slow key never holds back the rest of the batch
+        for key in keys:
+            task = asyncio.ensure_future(self._settle(key))
+            # keep a reference so the fetch is not garbage collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _settle(self, key: Tuple[Any, ...]) -> None:
+        fut = self._futures[key]
+        try:
+            result = await self._fetch_fn(*key)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as exc:
+            if not fut.done():
+                fut.set_exception(exc)
+        else:
+            if not fut.done():
+                fut.set_result(result)
+        finally:
+            self._futures.pop(key, None)
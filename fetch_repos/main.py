@@ -2,12 +2,29 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import os
+import re
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Tuple
 from .config import Config
 from .db import Database
-from .github_client import GitHubClient
+from .github_client import ETAG_CACHE_DIR, GitHubClient
+from .loader import Loader
 from .aggregator import compute_aggregates
 
+try:  # optional faster event loop (libuv based; not available on Windows)
+    import uvloop
+except ImportError:  # pragma: no cover
+    uvloop = None
+
+_NS_RE = re.compile(r"[^0-9A-Za-z_]+")
+
+# Rows buffered per table before a micro-batch is written
+FLUSH_ROWS = 500
+
+# Week epochs repeat across repos (about 52 distinct values a year), so format each only once
+_WEEK_ISO_CACHE: Dict[int, str] = {}
+
 
 def parse_args() -> Tuple[Config, bool]:
     p = argparse.ArgumentParser(description="Fetch GitHub repositories and compute aggregates")
@@ -57,8 +74,7 @@ def parse_args() -> Tuple[Config, bool]:
 
 
 def _namespace_from_target(target: str) -> str:
-    import re
-    return re.sub(r"[^0-9A-Za-z_]+", "_", target).strip("_").lower()[:40] or "default"
+    return _NS_RE.sub("_", target).strip("_").lower()[:40] or "default"
 
 
 async def fetch_and_store(cfg: Config, skip_aggregates: bool = False) -> None:
@@ -66,7 +82,9 @@ async def fetch_and_store(cfg: Config, skip_aggregates: bool = False) -> None:
     db = Database(cfg.db_path, namespace=ns)
     db.init_schema()
 
-    async with GitHubClient(token=cfg.token, concurrency=cfg.concurrency) as gh:
+    # One ETag file per target, so alternating targets never prune each other's entries
+    etag_cache_path = os.path.join(ETAG_CACHE_DIR, f"etags_{ns}.json")
+    async with GitHubClient(token=cfg.token, concurrency=cfg.concurrency, etag_cache_path=etag_cache_path) as gh:
         # Fetch repositories
         if cfg.target_type == "org":
             repos = await gh.list_org_repos(cfg.target)
@@ -76,125 +94,148 @@ async def fetch_and_store(cfg: Config, skip_aggregates: bool = False) -> None:
         if cfg.max_repos:
             repos = repos[: cfg.max_repos]
 
-        # Insert repositories first
+        # Insert repositories first; they commit on their own, so a failure later in the
+        # run never rolls them back
         db.upsert_repositories(repos)
 
+        # Pull the per-repo fields every fetcher needs once, rather than once per fetcher
+        repo_tuples = [(r["owner"]["login"], r["name"], int(r["id"]), r.get("pushed_at")) for r in repos]
+
+        # Extras cache entries are written along with the next micro-batch
+        cache_buf: List[Tuple[int, str, str, Any]] = []
+
+        # One loader per endpoint: coalesces calls issued in the same tick and dedups in-flight repeats
+        lang_loader = Loader(gh.get_repo_languages)
+        contrib_loader = Loader(gh.list_repo_contributors)
+        commit_activity_loader = Loader(gh.get_repo_commit_activity)
+        pr_loader = Loader(gh.list_repo_pull_requests)
+
         # Fetch languages (and contributors optionally) concurrently
-        async def fetch_repo_extras(repo: Dict[str, Any]) -> Dict[str, Any]:
-            owner = repo["owner"]["login"]
-            name = repo["name"]
-            rid = int(repo["id"])  # repo_id
-            langs = await gh.get_repo_languages(owner, name)
-            data: Dict[str, Any] = {"repo_id": rid, "languages": langs}
+        async def fetch_repo_extras(owner: str, name: str, rid: int, pushed_at: str | None) -> Dict[str, Any]:
+            # Languages and contributors only change with a push, so cache them per pushed_at
+            langs = db.get_cached_extra(rid, "languages", pushed_at) if pushed_at else None
+            if langs is None:
+                langs = await lang_loader.load((owner, name))
+                if pushed_at:
+                    cache_buf.append((rid, "languages", pushed_at, langs))
+            # rows in languages column order: (repo_id, language, bytes)
+            data: Dict[str, Any] = {"languages": [(rid, lang, b) for lang, b in langs.items()]}
             if cfg.include_contributors:
-                contrib = await gh.list_repo_contributors(owner, name)
-                # normalize only needed fields
-                norm = [{"login": c.get("login"), "contributions": c.get("contributions", 0)} for c in contrib]
-                data["contributors"] = norm
+                # Cached as [login, contributions] pairs
+                pairs = db.get_cached_extra(rid, "contributors", pushed_at) if pushed_at else None
+                if pairs is None:
+                    contrib = await contrib_loader.load((owner, name))
+                    # normalize only needed fields
+                    pairs = [(c.get("login"), c.get("contributions", 0)) for c in contrib]
+                    if pushed_at:
+                        cache_buf.append((rid, "contributors", pushed_at, pairs))
+                # rows in contributors column order: (repo_id, login, contributions)
+                data["contributors"] = [(rid, login, n) for login, n in pairs]
             return data
 
-        # Limit batch size to avoid blasting API too hard
-        tasks = [fetch_repo_extras(r) for r in repos]
-        results: List[Dict[str, Any]] = []
-        for i in range(0, len(tasks), 50):
-            batch = tasks[i : i + 50]
-            results.extend(await asyncio.gather(*batch))
-
-        # Split and save
-        lang_items = [{"repo_id": it["repo_id"], "languages": it["languages"]} for it in results]
-        if lang_items:
-            db.upsert_languages(lang_items)
-
-        if cfg.include_contributors:
-            contrib_items = [
-                {"repo_id": it["repo_id"], "contributors": it.get("contributors", [])}
-                for it in results
+        # Fetch DORA datasets (commit activity + PRs) alongside the extras;
+        # only a parseable --since narrows the PR window
+        since = None
+        if cfg.include_dora and cfg.since_iso:
+            try:
+                datetime.fromisoformat(cfg.since_iso)
+                since = cfg.since_iso
+            except ValueError:
+                since = None
+
+        async def fetch_commit_activity(owner: str, name: str, rid: int):
+            weeks = await commit_activity_loader.load((owner, name))
+            items = []
+            for w in weeks:
+                # w: {week: epoch_seconds, total: int}
+                try:
+                    wk = int(w.get("week", 0))
+                    week_start = _WEEK_ISO_CACHE.get(wk)
+                    if week_start is None:
+                        week_start = datetime.fromtimestamp(wk, timezone.utc).date().isoformat()
+                        _WEEK_ISO_CACHE[wk] = week_start
+                    items.append({"repo_id": rid, "week_start": week_start, "total": int(w.get("total", 0))})
+                except Exception:
+                    continue
+            return items
+
+        async def fetch_pull_requests(owner: str, name: str, rid: int):
+            # The since window and per-repo cap are applied while paginating, so
+            # pages beyond them are never requested
+            prs = await pr_loader.load((owner, name, "all", since, cfg.max_prs_per_repo))
+            # Rows in pull_requests column order: (repo_id, number, state, created_at, merged_at, closed_at)
+            return [
+                (rid, p.get("number"), p.get("state"), p.get("created_at"), p.get("merged_at"), p.get("closed_at"))
+                for p in prs
             ]
-            if contrib_items:
-                db.upsert_contributors(contrib_items)
 
-        # Fetch DORA datasets (commit activity + PRs)
+        # One task set for every per-repo fetch; GitHubClient's semaphore bounds concurrency,
+        # so no phase boundary leaves the network idle waiting on a slow tail
+        async def tagged(kind: str, coro: Any) -> Tuple[str, Any]:
+            return kind, await coro
+
+        tasks = [tagged("extras", fetch_repo_extras(*t)) for t in repo_tuples]
         if cfg.include_dora:
-            from datetime import datetime
-            since_dt = None
-            if cfg.since_iso:
-                try:
-                    since_dt = datetime.fromisoformat(cfg.since_iso)
-                except ValueError:
-                    since_dt = None
-
-            async def fetch_commit_activity(repo: Dict[str, Any]):
-                owner = repo["owner"]["login"]
-                name = repo["name"]
-                rid = int(repo["id"])
-                weeks = await gh.get_repo_commit_activity(owner, name)
-                items = []
-                for w in weeks:
-                    # w: {week: epoch_seconds, total: int}
-                    try:
-                        import datetime as _dt
-                        dt = _dt.datetime.utcfromtimestamp(int(w.get("week", 0)))
-                        week_start = dt.date().isoformat()
-                        items.append({"repo_id": rid, "week_start": week_start, "total": int(w.get("total", 0))})
-                    except Exception:
-                        continue
-                return items
-
-            async def fetch_pull_requests(repo: Dict[str, Any]):
-                owner = repo["owner"]["login"]
-                name = repo["name"]
-                rid = int(repo["id"])
-                prs = await gh.list_repo_pull_requests(owner, name, state="all")
-                # Optional filter by since date
-                if since_dt:
-                    prs = [p for p in prs if p.get("created_at") and p["created_at"] >= cfg.since_iso]
-                # Optional cap per repo
-                if cfg.max_prs_per_repo:
-                    prs = prs[: cfg.max_prs_per_repo]
-                # Normalize fields we need
-                norm = [
-                    {
-                        "repo_id": rid,
-                        "number": p.get("number"),
-                        "state": p.get("state"),
-                        "created_at": p.get("created_at"),
-                        "merged_at": p.get("merged_at"),
-                        "closed_at": p.get("closed_at"),
-                    }
-                    for p in prs
-                ]
-                return norm
-
-            # Commit activity tasks
-            ca_tasks = [fetch_commit_activity(r) for r in repos]
-            ca_results: List[List[Dict[str, Any]]] = []
-            for i in range(0, len(ca_tasks), 50):
-                batch = ca_tasks[i : i + 50]
-                ca_results.extend(await asyncio.gather(*batch))
-            flat_ca = [item for sub in ca_results for item in sub]
-            if flat_ca:
-                db.upsert_commit_activity(flat_ca)
-
-            # PR tasks
-            pr_tasks = [fetch_pull_requests(r) for r in repos]
-            pr_results: List[List[Dict[str, Any]]] = []
-            for i in range(0, len(pr_tasks), 25):
-                batch = pr_tasks[i : i + 25]
-                pr_results.extend(await asyncio.gather(*batch))
-            flat_prs = [item for sub in pr_results for item in sub]
-            if flat_prs:
-                db.upsert_pull_requests(flat_prs)
+            tasks += [tagged("commit_activity", fetch_commit_activity(o, n, rid)) for o, n, rid, _ in repo_tuples]
+            tasks += [tagged("pull_requests", fetch_pull_requests(o, n, rid)) for o, n, rid, _ in repo_tuples]
+        # Only the tuples are needed from here on
+        del repos
+
+        # Stream results into the DB as they complete, in bounded micro-batches, so
+        # SQLite writes overlap network stalls instead of waiting for the whole run;
+        # every buffer holds table rows, so FLUSH_ROWS means the same for each table
+        lang_buf: List[Tuple[int, str, int]] = []
+        contrib_buf: List[Tuple[int, str, int]] = []
+        ca_buf: List[Dict[str, Any]] = []
+        pr_buf: List[Tuple[Any, ...]] = []
+
+        buffers = (
+            (lang_buf, db.upsert_language_rows),
+            (contrib_buf, db.upsert_contributors),
+            (ca_buf, db.upsert_commit_activity),
+            (pr_buf, db.upsert_pull_requests),
+        )
+
+        def flush(force: bool = False) -> None:
+            # Once any buffer is full, write them all (and the pending cache entries) in one
+            # short transaction: the write lock is held only while writing a micro-batch,
+            # never across network waits, at the cost of one commit per batch
+            if not force and all(len(buf) < FLUSH_ROWS for buf, _ in buffers):
+                return
+            with db.transaction():
+                for buf, upsert in buffers:
+                    if buf:
+                        upsert(buf)
+                        buf.clear()
+                if cache_buf:
+                    db.put_cached_extras(cache_buf)
+                    cache_buf.clear()
+
+        for next_done in asyncio.as_completed(tasks):
+            kind, result = await next_done
+            if kind == "extras":
+                lang_buf.extend(result["languages"])
+                if cfg.include_contributors:
+                    contrib_buf.extend(result["contributors"])
+            elif kind == "commit_activity":
+                ca_buf.extend(result)
+            else:
+                pr_buf.extend(result)
+            flush()
+
+        flush(force=True)
 
         # Compute aggregates
         if not skip_aggregates:
-            compute_aggregates(db)
+            compute_aggregates(db, include_dora=cfg.include_dora)
 
         db.close()
 
 
 def main() -> None:
     cfg, skip_aggs = parse_args()
-    asyncio.run(fetch_and_store(cfg, skip_aggregates=skip_aggs))
+    run = uvloop.run if uvloop is not None else asyncio.run
+    run(fetch_and_store(cfg, skip_aggregates=skip_aggs))
 
 
 if __name__ == "__main__":
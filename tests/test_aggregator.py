@@ -109,3 +109,97 @@ def test_compute_aggregates_basic(tmp_path):
     assert extra_json is not None and "u/a" in extra_json
 
     db.close()
+
+
+def _repo(repo_id, stars, forks, language):
+    return {
+        "id": repo_id,
+        "name": f"r{repo_id}",
+        "full_name": f"u/r{repo_id}",
+        "owner": {"login": "u"},
+        "stargazers_count": stars,
+        "forks_count": forks,
+        "language": language,
+    }
+
+
+def test_upsert_repositories_applies_aggregate_deltas(tmp_path):
+    db = Database(str(tmp_path / "test.db"))
+    db.upsert_repositories([_repo(1, 10, 2, "Python"), _repo(2, 5, 3, "JavaScript")])
+    compute_aggregates(db)
+
+    # Star change, language move, and a brand new repo; no recompute
+    db.upsert_repositories([_repo(1, 12, 2, "Python"), _repo(2, 7, 4, "Python"), _repo(3, 1, 0, "Go")])
+
+    cur = db.conn.cursor()
+    cur.execute("SELECT metric, key, value FROM aggregates;")
+    rows = {(r[0], r[1]): r[2] for r in cur.fetchall()}
+    assert rows[("total_repos", None)] == 3.0
+    assert rows[("total_stars", None)] == 20.0
+    assert rows[("stars_by_language", "Python")] == 19.0
+    assert rows[("stars_by_language", "JavaScript")] == 0.0
+    assert rows[("stars_by_language", "Go")] == 1.0
+    assert rows[("forks_by_language", "Python")] == 6.0
+
+    # A full recompute agrees with the incrementally maintained values
+    compute_aggregates(db)
+    cur.execute("SELECT value FROM aggregates WHERE metric='total_stars' AND key IS NULL;")
+    assert [r[0] for r in cur.fetchall()] == [20.0]
+
+    db.close()
+
+
+def test_nested_transaction_rolls_back_as_one(tmp_path):
+    db = Database(str(tmp_path / "test.db"))
+    try:
+        with db.transaction():
+            db.upsert_repositories([_repo(1, 10, 2, "Python")])
+            db.upsert_languages([{"repo_id": 1, "languages": {"Python": 100}}])
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    # The inner upserts did not commit on their own, so the outer rollback undid both
+    cur = db.conn.cursor()
+    assert cur.execute("SELECT COUNT(*) FROM repositories;").fetchone()[0] == 0
+    assert cur.execute("SELECT COUNT(*) FROM languages;").fetchone()[0] == 0
+
+    db.close()
+
+
+def test_compute_aggregates_sees_uncommitted_writes(tmp_path):
+    db = Database(str(tmp_path / "test.db"))
+    with db.transaction():
+        db.upsert_repositories([_repo(1, 10, 2, "Python"), _repo(2, 5, 3, "Go")])
+        compute_aggregates(db)
+
+    cur = db.conn.cursor()
+    cur.execute("SELECT metric, key, value FROM aggregates;")
+    rows = {(r[0], r[1]): r[2] for r in cur.fetchall()}
+    # Totals and per-language rows come from the same (writer's) view of the data
+    assert rows[("total_repos", None)] == 2.0
+    assert rows[("total_stars", None)] == 15.0
+    assert rows[("stars_by_language", "Python")] == 10.0
+    cur.execute("SELECT extra_json FROM aggregates WHERE metric='top_repos_by_stars' AND key IS NULL;")
+    assert "u/r1" in cur.fetchone()[0]
+
+    db.close()
+
+
+def test_compute_aggregates_drops_vanished_languages(tmp_path):
+    db = Database(str(tmp_path / "test.db"))
+    db.upsert_repositories([_repo(1, 5, 1, "Go"), _repo(2, 3, 0, "Rust")])
+    compute_aggregates(db)
+
+    # The Go repo moves to Rust; a full recompute must not leave a Go row behind
+    db.upsert_repositories([_repo(1, 5, 1, "Rust")])
+    compute_aggregates(db)
+
+    cur = db.conn.cursor()
+    cur.execute("SELECT metric, key, value FROM aggregates WHERE metric LIKE '%_by_language' ORDER BY 1, 2;")
+    assert [tuple(r) for r in cur.fetchall()] == [
+        ("forks_by_language", "Rust", 1.0),
+        ("stars_by_language", "Rust", 8.0),
+    ]
+
+    db.close()
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from fetch_repos.github_client import GitHubClient
+
+
+def _repos_handler(total, hits, link=False):
+    # Paged /users/u/repos listing with one ETag per page; answers 304 when it matches
+    def handler(request):
+        page = int(request.url.params.get("page", 1))
+        per_page = int(request.url.params.get("per_page", 30))
+        hits.append(page)
+        etag = f'"p{page}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        start = (page - 1) * per_page
+        body = [{"id": i} for i in range(start, min(start + per_page, total))]
+        headers = {"ETag": etag}
+        if link:
+            last = -(-total // per_page)
+            headers["Link"] = f'<{request.url.copy_merge_params({"page": last})}>; rel="last"'
+        return httpx.Response(200, json=body, headers=headers)
+
+    return handler
+
+
+def _list_user_repos(handler, **kwargs):
+    async def run():
+        async with GitHubClient(transport=httpx.MockTransport(handler), **kwargs) as gh:
+            return await gh.list_user_repos("u")
+
+    return asyncio.run(run())
+
+
+def test_paginate_with_etags_is_stable_across_runs(tmp_path):
+    cache = str(tmp_path / "etags.json")
+    hits = []
+    handler = _repos_handler(250, hits)
+
+    for _ in range(3):
+        repos = _list_user_repos(handler, etag_cache_path=cache)
+        # The cached page-1 body must not absorb later pages
+        assert [r["id"] for r in repos] == list(range(250))
+
+
+def test_paginate_uses_link_last_page():
+    hits = []
+    repos = _list_user_repos(_repos_handler(250, hits, link=True), etag_cache_path=None)
+    assert [r["id"] for r in repos] == list(range(250))
+    # Link rel="last" sizes the listing exactly; no speculative pages past it
+    assert sorted(hits) == [1, 2, 3]
+
+
+def test_pull_requests_stop_at_since_and_cap():
+    hits = []
+
+    # 250 PRs, newest first: #250 created on day 250, ... #1 on day 1
+    def handler(request):
+        page = int(request.url.params["page"])
+        per_page = int(request.url.params["per_page"])
+        hits.append((page, per_page))
+        numbers = range(250 - (page - 1) * per_page, max(250 - page * per_page, 0), -1)
+        body = [{"number": n, "created_at": f"2024-{n:04d}"} for n in numbers]
+        return httpx.Response(200, json=body)
+
+    async def run(**kwargs):
+        async with GitHubClient(transport=httpx.MockTransport(handler), etag_cache_path=None) as gh:
+            return await gh.list_repo_pull_requests("u", "r", **kwargs)
+
+    prs = asyncio.run(run(since_iso="2024-0120"))
+    assert [p["number"] for p in prs] == list(range(250, 119, -1))
+    # page 2 holds the first PR older than since, so page 3 is never requested
+    assert hits == [(1, 100), (2, 100)]
+
+    hits.clear()
+    prs = asyncio.run(run(max_items=5))
+    assert [p["number"] for p in prs] == [250, 249, 248, 247, 246]
+    assert hits == [(1, 5)]
+
+
+def _get_languages(handler):
+    async def run():
+        async with GitHubClient(transport=httpx.MockTransport(handler), etag_cache_path=None) as gh:
+            return await gh.get_repo_languages("u", "r")
+
+    return asyncio.run(run())
+
+
+def test_rate_limit_retries_after_reset():
+    hits = []
+
+    def handler(request):
+        hits.append(1)
+        if len(hits) == 1:
+            # the window has already rolled over, so the retry goes out without waiting
+            reset = str(int(time.time()) - 1)
+            return httpx.Response(403, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset})
+        return httpx.Response(200, json={"Python": 10})
+
+    assert _get_languages(handler) == {"Python": 10}
+    assert len(hits) == 2
+
+
+def test_rate_limit_without_reset_raises():
+    hits = []
+
+    def handler(request):
+        hits.append(1)
+        return httpx.Response(403, headers={"X-RateLimit-Remaining": "0"})
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _get_languages(handler)
+    # no reset to wait for: fail instead of spinning on retries
+    assert len(hits) == 1
+
+
+def test_etag_cache_keeps_only_keys_used_this_run(tmp_path):
+    cache = tmp_path / "etags.json"
+    cache.write_text(json.dumps({"GET https://api.github.com/users/gone/repos []": ['"old"', [{"id": 0}]]}))
+
+    _list_user_repos(_repos_handler(150, []), etag_cache_path=str(cache))
+
+    saved = json.loads(cache.read_text())
+    # the stale key from an earlier run is pruned; this run's pages are kept
+    assert saved
+    assert all("/users/u/repos" in k for k in saved)
@@ -0,0 +1,60 @@
+import asyncio
+
+from fetch_repos.loader import Loader
+
+
+def test_loader_coalesces_and_dedups_in_flight():
+    calls = []
+
+    async def fetch(owner, name):
+        calls.append((owner, name))
+        await asyncio.sleep(0)
+        return f"{owner}/{name}"
+
+    async def run():
+        loader = Loader(fetch)
+        first = await asyncio.gather(loader.load(("u", "a")), loader.load(("u", "b")), loader.load(("u", "a")))
+        again = await loader.load(("u", "b"))
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first == ["u/a", "u/b", "u/a"]
+    assert again == "u/b"
+    # resolved results are not memoized, so a later load fetches again
+    assert calls == [("u", "a"), ("u", "b"), ("u", "b")]
+
+
+def test_loader_propagates_errors():
+    async def fetch(owner, name):
+        raise ValueError(name)
+
+    async def run():
+        loader = Loader(fetch)
+        try:
+            await loader.load(("u", "a"))
+        except ValueError as exc:
+            return str(exc)
+
+    assert asyncio.run(run()) == "a"
+
+
+def test_loader_slow_key_does_not_delay_others():
+    release = None
+
+    async def fetch(owner, name):
+        if name == "slow":
+            await release.wait()
+        return name
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        loader = Loader(fetch)
+        slow = loader.load(("u", "slow"))
+        fast = await asyncio.wait_for(asyncio.gather(loader.load(("u", "a")), loader.load(("u", "b"))), 1)
+        # the fast keys resolved while the slow fetch of the same batch is still pending
+        slow_pending = not slow.done()
+        release.set()
+        return fast, slow_pending, await slow
+
+    assert asyncio.run(run()) == (["a", "b"], True, "slow")
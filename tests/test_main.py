@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+
+from fetch_repos import main
+from fetch_repos.config import Config
+from fetch_repos.github_client import GitHubClient
+
+
+def _repo(repo_id, pushed_at="2024-01-01T00:00:00Z"):
+    return {
+        "id": repo_id,
+        "name": f"r{repo_id}",
+        "full_name": f"u/r{repo_id}",
+        "owner": {"login": "u"},
+        "stargazers_count": repo_id,
+        "forks_count": 0,
+        "language": "Python",
+        "pushed_at": pushed_at,
+    }
+
+
+def _use_transport(monkeypatch, handler, etag_dir=None):
+    # fetch_and_store builds its own client; point it at the mock, and at etag_dir
+    # (or no on-disk ETag cache at all) instead of the user's cache directory
+    if etag_dir:
+        monkeypatch.setattr(main, "ETAG_CACHE_DIR", str(etag_dir))
+
+    def client(**kwargs):
+        if not etag_dir:
+            kwargs["etag_cache_path"] = None
+        return GitHubClient(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(main, "GitHubClient", client)
+
+
+async def _committed_count(db_path, sql, want, timeout=2.0):
+    # Poll through a separate connection, which only sees committed rows
+    deadline = time.monotonic() + timeout
+    while True:
+        con = sqlite3.connect(db_path)
+        try:
+            n = con.execute(sql).fetchone()[0]
+        except sqlite3.OperationalError:
+            n = 0
+        finally:
+            con.close()
+        if n >= want or time.monotonic() > deadline:
+            return n
+        await asyncio.sleep(0.01)
+
+
+def test_slow_repo_does_not_hold_back_other_repos(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    observed = []
+
+    async def handler(request):
+        path = request.url.path
+        if path == "/users/u/repos":
+            return httpx.Response(200, json=[_repo(1), _repo(2), _repo(3)])
+        if path == "/repos/u/r1/languages":
+            # keep r1 in flight until the other repos' rows are committed
+            observed.append(
+                (
+                    await _committed_count(db_path, "SELECT COUNT(*) FROM languages_u WHERE repo_id != 1", 2),
+                    await _committed_count(db_path, "SELECT COUNT(*) FROM contributors_u WHERE repo_id != 1", 2),
+                )
+            )
+            return httpx.Response(200, json={"Python": 1})
+        if path.endswith("/languages"):
+            return httpx.Response(200, json={"Python": 10})
+        return httpx.Response(200, json=[{"login": "a", "contributions": 1}])
+
+    _use_transport(monkeypatch, handler)
+    monkeypatch.setattr(main, "FLUSH_ROWS", 1)
+    cfg = Config(target="u", target_type="user", token=None, db_path=db_path, include_contributors=True)
+    asyncio.run(main.fetch_and_store(cfg))
+
+    # r2/r3 languages and contributors were written while r1 was still being fetched
+    assert observed == [(2, 2)]
+    con = sqlite3.connect(db_path)
+    assert con.execute("SELECT COUNT(*) FROM languages_u").fetchone()[0] == 3
+    con.close()
+
+
+def test_etag_cache_survives_switching_targets(tmp_path, monkeypatch):
+    conditional = []
+
+    def handler(request):
+        path = request.url.path
+        if path.endswith("/repos") and path.startswith("/users/"):
+            etag = f'"{path}"'
+            if request.headers.get("If-None-Match") == etag:
+                conditional.append(path)
+                return httpx.Response(304, headers={"ETag": etag})
+            return httpx.Response(200, json=[_repo(1)], headers={"ETag": etag})
+        return httpx.Response(200, json={})
+
+    _use_transport(monkeypatch, handler, etag_dir=tmp_path / "etags")
+    db_path = str(tmp_path / "test.db")
+    for target in ("a", "b", "a"):
+        cfg = Config(target=target, target_type="user", token=None, db_path=db_path)
+        asyncio.run(main.fetch_and_store(cfg, skip_aggregates=True))
+
+    # running b in between did not prune a's entries
+    assert conditional == ["/users/a/repos"]
+
+
+def test_extras_cache_follows_pushed_at(tmp_path, monkeypatch):
+    state = {"pushed_at": "2024-01-01T00:00:00Z", "bytes": 10}
+    extras_hits = []
+
+    def handler(request):
+        path = request.url.path
+        if path == "/users/u/repos":
+            return httpx.Response(200, json=[_repo(1, pushed_at=state["pushed_at"])])
+        extras_hits.append(path)
+        if path.endswith("/languages"):
+            return httpx.Response(200, json={"Python": state["bytes"]})
+        return httpx.Response(200, json=[{"login": "a", "contributions": state["bytes"]}])
+
+    _use_transport(monkeypatch, handler)
+    db_path = str(tmp_path / "test.db")
+    cfg = Config(target="u", target_type="user", token=None, db_path=db_path, include_contributors=True)
+
+    def run():
+        extras_hits.clear()
+        asyncio.run(main.fetch_and_store(cfg, skip_aggregates=True))
+        con = sqlite3.connect(db_path)
+        try:
+            return (
+                sorted(extras_hits),
+                con.execute("SELECT bytes FROM languages_u WHERE repo_id=1").fetchone()[0],
+                con.execute("SELECT contributions FROM contributors_u WHERE repo_id=1").fetchone()[0],
+                con.execute("SELECT endpoint, pushed_at FROM extras_cache_u ORDER BY endpoint").fetchall(),
+            )
+        finally:
+            con.close()
+
+    first = run()
+    assert first[0] == ["/repos/u/r1/contributors", "/repos/u/r1/languages"]
+    assert first[1:3] == (10, 10)
+
+    # Same pushed_at: both come from the cache, no requests
+    assert run()[0:3] == ([], 10, 10)
+
+    # New push: refetched and the cache rows are replaced, not duplicated
+    state.update(pushed_at="2024-02-01T00:00:00Z", bytes=20)
+    hits, lang_bytes, contributions, cache_rows = run()
+    assert hits == ["/repos/u/r1/contributors", "/repos/u/r1/languages"]
+    assert (lang_bytes, contributions) == (20, 20)
+    assert cache_rows == [("contributors", "2024-02-01T00:00:00Z"), ("languages", "2024-02-01T00:00:00Z")]
@@ -1,48 +1,59 @@
 import os
+import re
 import sys
 import csv
 import sqlite3
 
 DB_DEFAULT = "data.db"
+_NS_RE = re.compile(r"[^0-9A-Za-z_]+")
+_IDENT_RE = re.compile(r"[A-Za-z_][0-9A-Za-z_]*")
+
+
+def _quote_ident(name: str) -> str:
+    # Table names can't be bound as parameters; only accept plain identifiers and quote them
+    if not _IDENT_RE.fullmatch(name):
+        raise ValueError(f"Invalid table name: {name!r}")
+    return f'"{name}"'
+
+
+def _write_csv(cur: sqlite3.Cursor, path: str) -> None:
+    # Header from the query's column names; rows stream from the cursor without a full fetch
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow([d[0] for d in cur.description])
+        w.writerows(cur)
 
 
 def export_top_repos(con: sqlite3.Connection, path: str, table: str, limit: int = 50) -> None:
-    rows = con.execute(
+    cur = con.execute(
         f"""
         SELECT full_name, stargazers_count AS stars, forks_count AS forks, language
-        FROM {table}
+        FROM {_quote_ident(table)}
         ORDER BY stargazers_count DESC, full_name ASC
         LIMIT ?;
         """,
         (limit,),
-    ).fetchall()
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["full_name", "stars", "forks", "language"])
-        w.writerows(rows)
+    )
+    _write_csv(cur, path)
 
 
 def export_stars_by_language(con: sqlite3.Connection, path: str, table: str) -> None:
-    rows = con.execute(
+    cur = con.execute(
         f"""
         SELECT language, SUM(stargazers_count) AS total_stars
-        FROM {table}
+        FROM {_quote_ident(table)}
         WHERE language IS NOT NULL
         GROUP BY language
         ORDER BY total_stars DESC, language ASC;
         """
-    ).fetchall()
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["language", "total_stars"])
-        w.writerows(rows)
+    )
+    _write_csv(cur, path)
 
 
 def _sanitize(ns: str | None) -> str | None:
     if not ns:
         return None
-    import re
-    cleaned = re.sub(r"[^0-9A-Za-z_]+", "_", ns).strip("_").lower()
+    cleaned = _NS_RE.sub("_", ns).strip("_").lower()
     return cleaned[:40] if cleaned else None
 
 
@@ -53,6 +64,10 @@ def main() -> None:
     namespace = _sanitize(namespace)
 
     con = sqlite3.connect(db_path)
+    # Exports are big sequential scans/joins: large page cache, in-memory sorts, mmap reads
+    con.execute("PRAGMA cache_size=-65536;")
+    con.execute("PRAGMA temp_store=MEMORY;")
+    con.execute("PRAGMA mmap_size=268435456;")
 
     # Determine repositories table based on namespace
     table = f"repositories_{namespace}" if namespace else "repositories"
@@ -73,28 +88,20 @@ def main() -> None:
     if commit_table in existing:
         # export commits by week aggregated across repos (with repo names)
         sql = f"""
-            SELECT r.full_name, c.week_start, c.total
-            FROM {table} r
-            JOIN {commit_table} c ON r.repo_id=c.repo_id
+            SELECT r.full_name, c.week_start, c.total AS commits
+            FROM {_quote_ident(table)} r
+            JOIN {_quote_ident(commit_table)} c ON r.repo_id=c.repo_id
             ORDER BY c.week_start ASC, r.full_name ASC;
         """
-        rows = con.execute(sql).fetchall()
-        with open(os.path.join(out_dir, "commit_activity.csv"), "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["full_name", "week_start", "commits"])
-            w.writerows(rows)
+        _write_csv(con.execute(sql), os.path.join(out_dir, "commit_activity.csv"))
     if pr_table in existing:
         sql = f"""
             SELECT r.full_name, p.number, p.state, p.created_at, p.merged_at, p.closed_at
-            FROM {table} r
-            JOIN {pr_table} p ON r.repo_id=p.repo_id
+            FROM {_quote_ident(table)} r
+            JOIN {_quote_ident(pr_table)} p ON r.repo_id=p.repo_id
             ORDER BY p.created_at DESC;
         """
-        rows = con.execute(sql).fetchall()
-        with open(os.path.join(out_dir, "pull_requests.csv"), "w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(["full_name", "number", "state", "created_at", "merged_at", "closed_at"])
-            w.writerows(rows)
+        _write_csv(con.execute(sql), os.path.join(out_dir, "pull_requests.csv"))
 
     print(f"Wrote: {os.path.join(out_dir, 'top_repos.csv')} and {os.path.join(out_dir, 'stars_by_language.csv')}")
 
@@ -17,12 +17,13 @@ def main():
         namespace = sys.argv[2]
     else:
         namespace = os.getenv("DB_NAMESPACE")
+    include_dora = os.getenv("INCLUDE_DORA", "0").lower() in {"1", "true", "yes"}
     db = Database(db_path, namespace=namespace)
-    compute_aggregates(db)
+    compute_aggregates(db, include_dora=include_dora)
 
     cur = db.conn.cursor()
     cur.execute("SELECT metric, key, value, extra_json FROM aggregates ORDER BY metric, key;")
-    for metric, key, value, extra_json in cur.fetchall():
+    for metric, key, value, extra_json in cur:
         print(metric, key, value, extra_json or "")
 
 